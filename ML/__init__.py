@@ -1,5 +1,12 @@
 """ML module for coal fire prediction."""
 
+import pandas as pd
+
+# Copy-on-Write: фильтры и выборки колонок не копируют данные до первой записи.
+# В pandas >= 3.0 режим включен всегда, опцию там трогать не нужно.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 from .model import CoalFireModel
 from .data_preprocessor import DataPreprocessor
 from .feature_engineering import FeatureEngineer
@@ -62,7 +62,7 @@ class DataPreprocessor:
         if not dfs: return pd.DataFrame()
         
         df = pd.concat(dfs, ignore_index=True)
-        df['weather_date'] = pd.to_datetime(pd.to_datetime(df['date'], errors='coerce').dt.date)
+        df['weather_date'] = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
         
         # Агрегируем по дням
         agg_df = df.groupby('weather_date').agg({
@@ -97,10 +97,14 @@ class DataPreprocessor:
         # 2. Основной мердж
         df = temp.merge(supplies_agg, on=['storage_id', 'stack_id'], how='left')
         
-        # 3. Мердж погоды
+        # 3. Мердж погоды: погода того же дня, если ее нет - соседнего (±1 день)
         if not weather.empty:
-            df['weather_date'] = pd.to_datetime(df['measurement_date'].dt.date)
-            df = df.merge(weather, on='weather_date', how='left')
+            df = df.dropna(subset=['measurement_date']).sort_values('measurement_date')
+            df['weather_date'] = df['measurement_date'].dt.normalize()
+            df = pd.merge_asof(
+                df, weather, on='weather_date',
+                direction='nearest', tolerance=pd.Timedelta(days=1)
+            )
             
         # 4. Мердж целевой переменной
         df = df.sort_values('measurement_date')
@@ -6,7 +6,7 @@ import numpy as np
 class FeatureEngineer:
     @staticmethod
     def create_features(df: pd.DataFrame) -> pd.DataFrame:
-        df = df.copy()
+        # sort_values уже возвращает новый DataFrame - отдельный copy() не нужен
         df = df.sort_values(['storage_id', 'stack_id', 'measurement_date'])
 
         # 1. Обработка категорий (Хэширование для простоты)
@@ -15,7 +15,7 @@ class FeatureEngineer:
         for col in cat_cols:
             if col in df.columns:
                 # Превращаем строку в число (hash), чтобы модель могла это съесть
-                df[f'{col}_encoded'] = df[col].astype(str).apply(lambda x: hash(x) % 1000)
+                df[f'{col}_encoded'] = df[col].map(FeatureEngineer.encode_category)
             else:
                 df[f'{col}_encoded'] = 0
 
@@ -50,6 +50,48 @@ class FeatureEngineer:
 
         return df.fillna(0)
 
+    @staticmethod
+    def encode_category(value) -> int:
+        # Пропуск (None/NaN) - всегда строка 'nan': в pandas 3 astype(str) оставляет
+        # его как float NaN, а hash(NaN) зависит от объекта, а не от значения
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            value = 'nan'
+        return hash(str(value)) % 1000
+
+    @staticmethod
+    def create_row_features(record: dict) -> dict[str, float]:
+        """
+        Признаки одного замера без истории штабеля.
+        То же, что create_features() на DataFrame из одной строки:
+        динамика нулевая, roll_max_7d = max_temp, пропуски -> 0.
+        """
+        def val(col, default=np.nan):
+            v = record.get(col, default)
+            return np.nan if v is None else float(v)
+
+        features = {col: val(col) for col in FeatureEngineer.get_feature_columns()}
+
+        for col in ['coal_grade', 'picket', 'shift', 'weather_code']:
+            features[f'{col}_encoded'] = FeatureEngineer.encode_category(record[col]) if col in record else 0
+
+        if 'wind_dir' in record:
+            wind_dir = np.nan_to_num(val('wind_dir'))
+            features['wind_sin'] = np.sin(2 * np.pi * wind_dir / 360)
+            features['wind_cos'] = np.cos(2 * np.pi * wind_dir / 360)
+        else:
+            features['wind_sin'] = 0
+            features['wind_cos'] = 0
+
+        features['drying_index'] = val('wind_speed_avg', 2) * (100 - val('weather_humidity', 50))
+
+        max_temp = np.nan_to_num(features['max_temp'])
+        features['max_temp'] = max_temp
+        features['temp_velocity'] = 0
+        features['temp_acceleration'] = 0
+        features['roll_max_7d'] = max_temp
+
+        return {k: float(np.nan_to_num(v)) for k, v in features.items()}
+
     @staticmethod
     def get_feature_columns() -> list[str]:
         return [
@@ -1,18 +1,20 @@
 """XGBoost с авто-тюнингом (Optuna - Fast Version)."""
 from __future__ import annotations
 import xgboost as xgb
-import optuna
 import numpy as np
 import pandas as pd
 import joblib
 from pathlib import Path
-from sklearn.metrics import mean_absolute_error
-from sklearn.model_selection import TimeSeriesSplit
+
+# Сколько деревьев добавить к бустеру последнего фолда при дообучении на всех данных
+WARM_START_EXTRA_ROUNDS = 50
 
 class CoalFireModel:
     def __init__(self):
         self.model = None
         self.feature_names = None
+        # Модель последнего фолда лучшего trial (самая длинная история) - для warm start
+        self.warm_model = None
         # Дефолтные параметры (если Optuna упадет или будет отключена)
         self.best_params = {
             'n_estimators': 300, 
@@ -24,7 +26,13 @@ class CoalFireModel:
 
     def optimize(self, X: pd.DataFrame, y: pd.Series, n_trials=10):
         """Поиск идеальных гиперпараметров (УСКОРЕННЫЙ)."""
+        # Импорты только для обучения: инференс (backend) не платит за их загрузку
+        import optuna
+        from sklearn.metrics import mean_absolute_error
+        from sklearn.model_selection import TimeSeriesSplit
+        
         print(f"🎯 Запуск оптимизации Optuna ({n_trials} попыток)...")
+        best = {'score': np.inf, 'model': None}
         
         def objective(trial):
             param = {
@@ -55,7 +63,10 @@ class CoalFireModel:
                 preds = model.predict(X_val)
                 scores.append(mean_absolute_error(y_val, preds))
             
-            return np.mean(scores)
+            score = np.mean(scores)
+            if score < best['score']:
+                best['score'], best['model'] = score, model
+            return score
 
         # Ограничиваем время (не больше 60 секунд на поиск) или количество попыток
         study = optuna.create_study(direction='minimize')
@@ -65,15 +76,31 @@ class CoalFireModel:
         self.best_params = study.best_params
         self.best_params['objective'] = 'reg:squarederror'
         self.best_params['n_jobs'] = -1
+        self.warm_model = best['model']
 
-    def train_final(self, X: pd.DataFrame, y: pd.Series):
+    def train_final(self, X: pd.DataFrame, y: pd.Series, refit_on_full: bool = True):
+        """
+        Финальное обучение на всех данных.
+        refit_on_full=False: не учим с нуля, а дообучаем бустер последнего CV-фолда
+        (WARM_START_EXTRA_ROUNDS деревьев на полном объеме).
+        """
         self.feature_names = X.columns.tolist()
         
+        if not refit_on_full and self.warm_model is not None:
+            print(f"♻️ Дообучаем модель последнего фолда (+{WARM_START_EXTRA_ROUNDS} деревьев)")
+            params = {**self.best_params, 'n_estimators': WARM_START_EXTRA_ROUNDS}
+            self.model = xgb.XGBRegressor(**params)
+            self.model.fit(X, y, xgb_model=self.warm_model.get_booster(), verbose=False)
+            return
+        
         print(f"⚙️ Применяем параметры: {self.best_params}")
         self.model = xgb.XGBRegressor(**self.best_params)
         self.model.fit(X, y, verbose=False)
         
-    def predict(self, X: pd.DataFrame) -> np.ndarray:
+    def predict(self, X: pd.DataFrame | np.ndarray) -> np.ndarray:
+        # Массив признаков должен идти в порядке feature_names
+        if isinstance(X, np.ndarray):
+            return np.maximum(self.model.predict(X), 0)
         if self.feature_names:
             # Гарантируем порядок колонок как при обучении
             # Если какой-то колонки нет - ошибка (или заполним 0)
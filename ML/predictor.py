@@ -3,17 +3,65 @@
 from __future__ import annotations
 
 import json
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from typing import Dict, Any, List
+from joblib import Memory
 
 # Импорты из соседних модулей
 from .data_preprocessor import DataPreprocessor
 from .feature_engineering import FeatureEngineer
 from .model import CoalFireModel
 from .metrics import evaluate_model, print_metrics_report
-from sklearn.model_selection import TimeSeriesSplit
+
+# Границы (дни до пожара) и названия уровней риска
+_RISK_BINS = (-1, 7, 14, 30, 60, 10000)
+_RISK_LABELS = ('критический', 'высокий', 'средний', 'низкий', 'минимальный')
+
+# Имена полей API -> колонки модели и значения для отсутствующих полей
+_INPUT_RENAME = {'max_temperature': 'max_temp', 'pile_age_days': 'days_since_formation', 'stack_mass_tons': 'coal_weight'}
+_INPUT_DEFAULTS = {'days_since_formation': 0, 'weather_temp': 10, 'weather_humidity': 70, 'wind_speed_avg': 3, 'coal_weight': 5000}
+
+# Порядок колонок по умолчанию (если в загруженной модели не сохранены feature_names)
+FEATURE_ORDER = tuple(FeatureEngineer.get_feature_columns())
+
+# Сколько различных строк признаков помнит кэш predict_one
+_SCORE_CACHE_SIZE = 4096
+
+# Выше этого объема CSV кэш на диске дороже повторной загрузки
+_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+
+def _confidence(temps):
+    """Расчет уверенности от температуры (физика)."""
+    return 0.4 + 0.55 / (1 + np.exp(-(temps - 45) / 10))
+
+
+def _risk_level(days: float) -> str:
+    """То же разбиение, что pd.cut(bins=_RISK_BINS), для одного значения."""
+    i = bisect_left(_RISK_BINS, days) - 1
+    return _RISK_LABELS[min(max(i, 0), len(_RISK_LABELS) - 1)]
+
+
+def _load_full_dataset(data_dir: str, fingerprint: tuple) -> pd.DataFrame:
+    """Сборка сырого датасета. fingerprint (имя, размер, mtime CSV) - ключ кэша joblib."""
+    return DataPreprocessor(data_dir).prepare_full_dataset()
+
+
+def _data_fingerprint(data_dir: Path) -> tuple:
+    # Код препроцессора тоже часть ключа: правка сборки датасета сбрасывает кэш
+    sources = [*sorted(data_dir.glob("*.csv")), Path(__file__).with_name("data_preprocessor.py")]
+    return tuple(
+        (p.name, st.st_size, st.st_mtime_ns)
+        for p in sources
+        for st in (p.stat(),)
+    )
+
 
 class CoalCombustionPredictor:
     """
@@ -35,22 +83,38 @@ class CoalCombustionPredictor:
         self.model_path = self.artifacts_dir / "models" / "coal_fire_model.pkl"
         self.metrics_path = self.artifacts_dir / "training_metrics.json"
         
+        # Кэш сырого датасета: повторные обучения на тех же CSV не парсят их заново
+        self._memory = Memory(str(self.artifacts_dir / "cache"), verbose=0)
+        self._load_full_dataset = self._memory.cache(_load_full_dataset)
+        
+        # Модель детерминирована: повторный замер с теми же признаками берем из кэша.
+        # Сбрасывается при обучении, т.к. привязан к текущей модели
+        self._score_row = lru_cache(maxsize=_SCORE_CACHE_SIZE)(self._score_row_uncached)
+        
         if self.model_path.exists():
             try:
                 self.model.load(self.model_path)
             except Exception as e:
                 print(f"⚠️ Ошибка загрузки модели: {e}")
+        self._on_model_changed()
+    
+    def _on_model_changed(self) -> None:
+        """Пересобрать то, что привязано к текущей модели: порядок признаков и кэш скоров."""
+        # itemgetter достает всю строку признаков из dict одним вызовом
+        self._feature_row = itemgetter(*(self.model.feature_names or FEATURE_ORDER))
+        self._score_row.cache_clear()
     
-    def train(self) -> Dict[str, Any]:
+    def train(self, refit_on_full: bool = True) -> Dict[str, Any]:
         """
         Обучение на ПОЛНОМ датасете без потери 20% данных.
+        refit_on_full=False - вместо повторного обучения с нуля дообучить лучшую модель из Optuna.
         """
         print("\n" + "="*60)
         print("🔥 ЗАПУСК ОБУЧЕНИЯ НА 100% ДАННЫХ")
         print("="*60)
         
         # 1. Загрузка
-        raw_df = self.preprocessor.prepare_full_dataset()
+        raw_df = self._load_training_data()
         if raw_df.empty: raise ValueError("❌ Датасет пуст!")
 
         # 2. Фичи
@@ -58,13 +122,11 @@ class CoalCombustionPredictor:
         
         # 3. Фильтрация (0-60 дней до пожара)
         print("\n🔪 Фильтрация выборки (0 <= дней до пожара <= 60)...")
+        # Сортировка по времени обязательна
         df_model = full_df[
             (full_df['days_until_fire'] >= 0) & 
             (full_df['days_until_fire'] <= 60)
-        ].copy()
-        
-        # Сортировка по времени обязательна
-        df_model = df_model.sort_values('measurement_date')
+        ].sort_values('measurement_date')
         
         if len(df_model) < 10: raise ValueError("❌ Критически мало данных (<10).")
             
@@ -91,7 +153,7 @@ class CoalCombustionPredictor:
 
         # 6. ФИНАЛЬНОЕ ОБУЧЕНИЕ (FIT) НА 100% ДАННЫХ
         print("\n💪 Финальное обучение модели на полном объеме...")
-        self.model.train_final(X, y)
+        self.model.train_final(X, y, refit_on_full=refit_on_full)
         
         # 7. Оценка (Self-Check)
         # Так как мы обучились на всем, смотрим метрики на том же train-сете.
@@ -121,20 +183,25 @@ class CoalCombustionPredictor:
         print(f"\n💾 Сохранение модели в {self.model_path}...")
         self.model.save(self.model_path)
         self._save_metrics(metrics)
+        self._on_model_changed()
         
         return metrics
     
+    def _load_training_data(self) -> pd.DataFrame:
+        fingerprint = _data_fingerprint(self.data_dir)
+        if sum(size for _, size, _ in fingerprint) > _CACHE_MAX_BYTES:
+            return self.preprocessor.prepare_full_dataset()
+        return self._load_full_dataset(str(self.data_dir), fingerprint)
+    
     def predict(self, input_df: pd.DataFrame) -> List[Dict[str, Any]]:
         """Инференс."""
         if not self.model_path.exists(): raise FileNotFoundError("❌ Модель не обучена!")
-        df = input_df.copy()
+        df = input_df.reset_index(drop=True)
         
-        rename_map = {'max_temperature': 'max_temp', 'pile_age_days': 'days_since_formation', 'stack_mass_tons': 'coal_weight'}
-        df = df.rename(columns=rename_map)
+        df = df.rename(columns=_INPUT_RENAME)
         
         # Заглушки для отсутствующих данных
-        defaults = {'days_since_formation': 0, 'weather_temp': 10, 'weather_humidity': 70, 'wind_speed_avg': 3, 'coal_weight': 5000}
-        for c, v in defaults.items():
+        for c, v in _INPUT_DEFAULTS.items():
             if c not in df.columns: df[c] = v
             
         df_features = self.feature_engineer.create_features(df)
@@ -144,35 +211,99 @@ class CoalCombustionPredictor:
             
         X = df_features[feature_cols].fillna(0)
         preds_df = self.predict_with_confidence(X)
+        # create_features сортирует строки - возвращаем исходный порядок входа
+        preds_df.index = X.index
+        preds_df = preds_df.loc[df.index]
+        
+        unknown = ['unknown'] * len(df)
+        storage_ids = df['storage_id'].tolist() if 'storage_id' in df.columns else unknown
+        stack_ids = df['stack_id'].tolist() if 'stack_id' in df.columns else unknown
+        return [
+            {
+                'storage_id': str(storage_id),
+                'stack_id': str(stack_id),
+                'predicted_ttf_days': float(days),
+                'risk_level': str(risk),
+                'confidence': float(conf)
+            }
+            for storage_id, stack_id, days, risk, conf in zip(
+                storage_ids, stack_ids,
+                preds_df['predicted_days'].to_numpy(),
+                preds_df['risk_level'].tolist(),
+                preds_df['confidence'].to_numpy()
+            )
+        ]
+
+    def warm_up(self) -> None:
+        """Один пробный предикт: прогревает код инференса до первого запроса."""
+        # Файл модели может быть, а загрузка упасть (битый pickle, другая версия xgboost)
+        if self.model.model is not None:
+            self.predict_one({'storage_id': 'warmup', 'stack_id': 'warmup', 'max_temp': 20.0})
+
+    def predict_one(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Быстрый путь для одного замера: без DataFrame, признаки сразу в строку ndarray."""
+        if not self.model_path.exists(): raise FileNotFoundError("❌ Модель не обучена!")
+        record = {**_INPUT_DEFAULTS, **{_INPUT_RENAME.get(k, k): v for k, v in record.items()}}
+        features = self.feature_engineer.create_row_features(record)
+        days = self._score_row(self._feature_row(features))
+        return {
+            'storage_id': str(record.get('storage_id', 'unknown')),
+            'stack_id': str(record.get('stack_id', 'unknown')),
+            'predicted_ttf_days': days,
+            'risk_level': _risk_level(days),
+            'confidence': float(_confidence(features['max_temp']))
+        }
+
+    def _score_row_uncached(self, row: tuple) -> float:
+        X = np.fromiter(row, dtype=np.float32, count=len(row)).reshape(1, -1)
+        return float(self.model.predict(X)[0])
+
+    def predict_records(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Инференс для набора независимых замеров одним вызовом модели.
+        В отличие от predict() строки не считаются историей штабеля:
+        каждая оценивается так же, как если бы пришла одна.
+        """
+        if not self.model_path.exists(): raise FileNotFoundError("❌ Модель не обучена!")
+        n_cols = len(self.model.feature_names or FEATURE_ORDER)
+        
+        prepared = []
+        features = []
+        for record in records:
+            record = {**_INPUT_DEFAULTS, **{_INPUT_RENAME.get(k, k): v for k, v in record.items()}}
+            prepared.append(record)
+            features.append(self.feature_engineer.create_row_features(record))
+        
+        # Матрица признаков заполняется сразу в float32 (тип, с которым работает XGBoost)
+        n_rows = len(features)
+        X = np.fromiter(
+            chain.from_iterable(map(self._feature_row, features)),
+            dtype=np.float32, count=n_rows * n_cols
+        ).reshape(n_rows, n_cols)
+        predictions = self.model.predict(X)
+        confidence = _confidence(np.fromiter((f['max_temp'] for f in features), dtype=np.float64, count=n_rows))
         
-        results = []
-        for i, row in df.iterrows():
-            results.append({
-                'storage_id': str(row.get('storage_id', 'unknown')),
-                'stack_id': str(row.get('stack_id', 'unknown')),
-                'predicted_ttf_days': float(preds_df.iloc[i]['predicted_days']),
-                'risk_level': str(preds_df.iloc[i]['risk_level']),
-                'confidence': float(preds_df.iloc[i]['confidence'])
-            })
-        return results
+        return [
+            {
+                'storage_id': str(record.get('storage_id', 'unknown')),
+                'stack_id': str(record.get('stack_id', 'unknown')),
+                'predicted_ttf_days': float(days),
+                'risk_level': _risk_level(days),
+                'confidence': float(conf)
+            }
+            for record, days, conf in zip(prepared, predictions.tolist(), confidence.tolist())
+        ]
 
     def predict_with_confidence(self, X: pd.DataFrame) -> pd.DataFrame:
         predictions = self.model.predict(X)
         predictions = np.maximum(predictions, 0)
         
-        # Расчет уверенности от температуры (физика)
         if 'max_temp' in X.columns:
-            temps = X['max_temp'].reset_index(drop=True)
-            confidence = 1 / (1 + np.exp(-(temps - 45) / 10))
-            confidence = 0.4 + (confidence * 0.55)
+            confidence = _confidence(X['max_temp'].reset_index(drop=True))
         else:
             confidence = pd.Series([0.7] * len(predictions))
             
-        risk_level = pd.cut(
-            predictions,
-            bins=[-1, 7, 14, 30, 60, 10000],
-            labels=['критический', 'высокий', 'средний', 'низкий', 'минимальный']
-        )
+        risk_level = pd.cut(predictions, bins=_RISK_BINS, labels=_RISK_LABELS)
         return pd.DataFrame({'predicted_days': predictions, 'confidence': confidence, 'risk_level': risk_level})
 
     def _save_metrics(self, metrics: Dict[str, Any]) -> None:
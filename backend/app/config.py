@@ -0,0 +1,43 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+# backend/app/config.py -> корень проекта (где лежат ML, data и backend)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Настройки приложения. Читаются из окружения один раз в get_config()."""
+    database_url: str
+    data_dir: Path
+    artifacts_dir: Path
+    # Пул соединений (для серверных СУБД; у sqlite свой пул по умолчанию)
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_recycle: int
+    # Создавать таблицы/индексы при старте (выключить, если схемой управляют миграции)
+    run_create_all: bool
+    # Origin фронтенда для CORS (через запятую в CORS_ORIGINS)
+    cors_origins: tuple[str, ...]
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Settings:
+    return Settings(
+        database_url=os.getenv("DATABASE_URL", "sqlite:///./sql_app.db"),
+        data_dir=Path(os.getenv("DATA_DIR", PROJECT_ROOT / "data")),
+        artifacts_dir=Path(os.getenv("ARTIFACTS_DIR", PROJECT_ROOT / "ML" / "artifacts")),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+        db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "40")),
+        db_pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        run_create_all=os.getenv("RUN_CREATE_ALL", "1") == "1",
+        cors_origins=tuple(
+            origin.strip()
+            for origin in os.getenv(
+                "CORS_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,http://localhost:3000"
+            ).split(",")
+            if origin.strip()
+        ),
+    )
@@ -1,13 +1,35 @@
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from .config import get_config
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+config = get_config()
+SQLALCHEMY_DATABASE_URL = config.database_url
+is_sqlite = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 
+# check_same_thread - опция только драйвера sqlite
+connect_args = {"check_same_thread": False} if is_sqlite else {}
+
+# Пул под threadpool FastAPI: соединения переиспользуются, устаревшие закрываются
+# по pool_recycle вместо лишнего SELECT 1 (pre_ping) на каждой выдаче соединения
+pool_args = {} if is_sqlite else {
+    "pool_size": config.db_pool_size,
+    "max_overflow": config.db_max_overflow,
+    "pool_recycle": config.db_pool_recycle,
+    "pool_pre_ping": False,
+}
+
+# JSON-колонки (Prediction.input_data) кодируем через orjson вместо stdlib json
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=connect_args,
+    **pool_args,
+    json_serializer=lambda obj: orjson.dumps(obj).decode(),
+    json_deserializer=orjson.loads,
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: после commit объект не перечитывается из БД (id и created_at уже заполнены при flush)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
@@ -0,0 +1,21 @@
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Логгер пакета app: запись в stderr делает отдельный поток QueueListener.
+# Сообщение собирается еще в потоке запроса (QueueHandler.prepare вызывает format),
+# но ожидание I/O на вывод из него уходит
+logger = logging.getLogger("app")
+logger.setLevel(logging.INFO)
+
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(_queue))
+logger.propagate = False
+
+
+def start_log_listener() -> QueueListener:
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = QueueListener(_queue, stream, respect_handler_level=True)
+    listener.start()
+    return listener
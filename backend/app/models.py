@@ -1,4 +1,5 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, JSON, ForeignKey, Enum
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, JSON, ForeignKey, Enum, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -26,6 +27,9 @@ class User(Base):
 
     predictions = relationship("Prediction", back_populates="owner")
 
+    # Фильтр списка пользователей в админке (?status=...)
+    __table_args__ = (Index("ix_users_status_role", "status", "role"),)
+
 class Prediction(Base):
     __tablename__ = "predictions"
 
@@ -35,7 +39,7 @@ class Prediction(Base):
     # Входные данные
     storage_id = Column(String)
     stack_id = Column(String)
-    input_data = Column(JSON)  # Полный JSON входных данных
+    input_data = Column(JSON().with_variant(JSONB, "postgresql"))  # Полный JSON входных данных
     
     # Результат ML
     predicted_days = Column(Integer)
@@ -44,4 +48,15 @@ class Prediction(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    owner = relationship("User", back_populates="predictions")
\ No newline at end of file
+    owner = relationship("User", back_populates="predictions")
+
+    # История и дашборд: WHERE user_id = ? ORDER BY created_at DESC;
+    # счетчик критических на дашборде: частичный индекс только по строкам predicted_days < 7
+    __table_args__ = (
+        Index("ix_predictions_user_created", "user_id", "created_at"),
+        Index(
+            "ix_predictions_user_critical", "user_id",
+            postgresql_where=text("predicted_days < 7"),
+            sqlite_where=text("predicted_days < 7"),
+        ),
+    )
\ No newline at end of file
@@ -0,0 +1,7 @@
+from fastapi import APIRouter
+from . import auth, admin, prediction
+
+# Все роутеры API собраны здесь: main.py подключает их одним include_router
+api_router = APIRouter()
+for module in (auth, admin, prediction):
+    api_router.include_router(module.router)
@@ -9,7 +9,7 @@ router = APIRouter(prefix="/admin", tags=["Admin Dashboard"])
 def get_all_users(
     status: str = None,
     db: Session = Depends(database.get_db),
-    admin: models.User = Depends(security.get_current_admin)
+    admin: security.CurrentUser = Depends(security.get_current_admin)
 ):
     query = db.query(models.User)
     if status:
@@ -20,7 +20,7 @@ def get_all_users(
 def approve_user(
     user_id: int,
     db: Session = Depends(database.get_db),
-    admin: models.User = Depends(security.get_current_admin)
+    admin: security.CurrentUser = Depends(security.get_current_admin)
 ):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -28,13 +28,14 @@ def approve_user(
     
     user.status = models.UserStatus.APPROVED
     db.commit()
+    security.invalidate_cached_user(user.email)
     return {"message": f"Пользователь {user.email} одобрен"}
 
 @router.patch("/users/{user_id}/reject")
 def reject_user(
     user_id: int,
     db: Session = Depends(database.get_db),
-    admin: models.User = Depends(security.get_current_admin)
+    admin: security.CurrentUser = Depends(security.get_current_admin)
 ):
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -42,4 +43,5 @@ def reject_user(
     
     user.status = models.UserStatus.REJECTED
     db.commit()
+    security.invalidate_cached_user(user.email)
     return {"message": f"Пользователь {user.email} заблокирован"}
\ No newline at end of file
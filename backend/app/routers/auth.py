@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from .. import schemas, models, security, database
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# Пользователи только добавляются: как только в БД кто-то появился, больше не проверяем
+users_exist = False
+
 @router.post("/register", response_model=schemas.UserResponse)
 def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
+    global users_exist
+    email_taken = db.query(models.User.id).filter(models.User.email == user.email).first()
+    if email_taken:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Первого юзера делаем админом для удобства, остальных - обычными
-    is_first = db.query(models.User).count() == 0
+    if not users_exist:
+        users_exist = db.query(models.User.id).first() is not None
+    is_first = not users_exist
     role = models.UserRole.ADMIN if is_first else models.UserRole.USER
     status = models.UserStatus.APPROVED if is_first else models.UserStatus.PENDING
     
@@ -25,14 +31,24 @@ def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
     )
     db.add(new_user)
     db.commit()
-    db.refresh(new_user)
+    users_exist = True
+    security.invalidate_cached_user(new_user.email)
     return new_user
 
 @router.post("/login")
-def login(user_credentials: schemas.UserLogin, db: Session = Depends(database.get_db)):
+def login(user_credentials: schemas.UserLogin, request: Request, db: Session = Depends(database.get_db)):
+    # Перебор паролей к одному email с одного IP; другие пользователи за тем же NAT не блокируются.
+    # Более высокий общий лимит на IP отсекает подбор одного пароля по многим аккаунтам
+    ip_key = f"login:{security.client_ip(request)}"
+    rate_key = f"{ip_key}|{user_credentials.email}"
+    security.check_auth_rate(ip_key, security.AUTH_IP_FAIL_LIMIT)
+    security.check_auth_rate(rate_key)
+    
     user = db.query(models.User).filter(models.User.email == user_credentials.email).first()
     
     if not user or not security.verify_password(user_credentials.password, user.hashed_password):
+        security.record_auth_failure(ip_key)
+        security.record_auth_failure(rate_key)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль"
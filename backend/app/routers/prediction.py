@@ -1,19 +1,15 @@
+import logging
 import sys
-import pandas as pd
-from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, defer
+from typing import List, Optional, Tuple
 from .. import schemas, models, security, database
+from ..config import PROJECT_ROOT, get_config
 
-# --- НАСТРОЙКА ПУТЕЙ ---
-# Текущий файл: backend/app/routers/prediction.py
-# Нам нужно попасть в корень проекта (где папки ML и backend лежат рядом)
-# .parents[0] = routers
-# .parents[1] = app
-# .parents[2] = backend
-# .parents[3] = КОРЕНЬ PROJEKTA
-PROJECT_ROOT = Path(__file__).resolve().parents[3]
+logger = logging.getLogger(__name__)
 
 # Добавляем корень в sys.path, чтобы питон видел модуль ML
 if str(PROJECT_ROOT) not in sys.path:
@@ -23,27 +19,24 @@ if str(PROJECT_ROOT) not in sys.path:
 try:
     from ML.predictor import CoalCombustionPredictor
 except ImportError as e:
-    print(f"❌ ОШИБКА ИМПОРТА ML: {e}")
-    print(f"   Ожидаемый путь к ML: {PROJECT_ROOT / 'ML'}")
+    logger.error("ОШИБКА ИМПОРТА ML: %s (ожидаемый путь к ML: %s)", e, PROJECT_ROOT / "ML")
     # Не падаем сразу, чтобы хоть сваггер открылся, но модель работать не будет
     CoalCombustionPredictor = None
 
-# Инициализация ML модели (Синглтон)
-predictor = None
+# Инициализация ML модели: создается один раз в lifespan приложения (main.py)
+# и живет в app.state.predictor
+def create_predictor():
+    if CoalCombustionPredictor is None:
+        return None
+    cfg = get_config()
+    logger.info("Инициализация модели из %s", cfg.artifacts_dir)
+    return CoalCombustionPredictor(cfg.data_dir, cfg.artifacts_dir)
 
-def get_predictor():
-    global predictor
-    if predictor is None:
-        if CoalCombustionPredictor is None:
-             raise HTTPException(500, "ML модуль не загружен. Проверьте пути.")
-             
-        data_dir = PROJECT_ROOT / "data"
-        artifacts_dir = PROJECT_ROOT / "ML" / "artifacts"
-        
-        print(f"🔄 Инициализация модели из {artifacts_dir}...")
-        predictor = CoalCombustionPredictor(data_dir, artifacts_dir)
-        
-    return predictor
+def get_predictor(request: Request):
+    ml_model = getattr(request.app.state, "predictor", None)
+    if ml_model is None:
+        raise HTTPException(500, "ML модуль не загружен. Проверьте пути.")
+    return ml_model
 
 router = APIRouter(prefix="/predict", tags=["ML Prediction"])
 
@@ -58,158 +51,108 @@ def analyze_chemical_risks(data: schemas.PredictionInput) -> List[str]:
         warnings.append("⚠️ Уголь слишком сухой, риск возгорания повышен.")
     return warnings
 
-@router.post("/", response_model=schemas.PredictionResponse)
-def predict_coal_fire(
-    input_data: schemas.PredictionInput,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(security.get_current_active_user)
-):
-    ml_model = get_predictor()
-    
-    try:
-        data_dict = input_data.model_dump()
-        
-        # МАППИНГ ВСЕХ ПОЛЕЙ (API -> ML DataFrame columns)
-        mapped_data = {
-            'storage_id': data_dict.get('storage_id'),
-            'stack_id': data_dict.get('stack_id'),
-            'max_temp': data_dict.get('max_temperature'),
-            'coal_grade': data_dict.get('coal_grade'),
-            'days_since_formation': data_dict.get('pile_age_days'),
-            'coal_weight_storage': data_dict.get('stack_mass_tons'),
-            
-            # Новые поля (локация)
-            'picket': data_dict.get('picket'),
-            'shift': data_dict.get('shift'),
-            
-            # Новые поля (погода full)
-            'weather_temp': data_dict.get('weather_temp'),
-            'weather_humidity': data_dict.get('weather_humidity'),
-            'pressure': data_dict.get('pressure'),
-            'weather_precipitation': data_dict.get('precipitation'),
-            'cloud_cover': data_dict.get('cloud_cover'),
-            'visibility': data_dict.get('visibility'),
-            'wind_speed_avg': data_dict.get('wind_speed'),
-            'wind_speed_max': data_dict.get('wind_speed_max'),
-            'wind_dir': data_dict.get('wind_direction'),
-            'weather_code': data_dict.get('weather_code'),
-            
-            'measurement_date': data_dict.get('measurement_date')
-        }
+def to_model_record(data_dict: dict) -> dict:
+    """МАППИНГ ВСЕХ ПОЛЕЙ (API -> ML DataFrame columns)"""
+    return {
+        'storage_id': data_dict.get('storage_id'),
+        'stack_id': data_dict.get('stack_id'),
+        'max_temp': data_dict.get('max_temperature'),
+        'coal_grade': data_dict.get('coal_grade'),
+        'days_since_formation': data_dict.get('pile_age_days'),
+        'coal_weight_storage': data_dict.get('stack_mass_tons'),
         
-        input_df = pd.DataFrame([mapped_data])
+        # Новые поля (локация)
+        'picket': data_dict.get('picket'),
+        'shift': data_dict.get('shift'),
         
-        # Предикт
-        results = ml_model.predict(input_df)
-        result = results[0]
+        # Новые поля (погода full)
+        'weather_temp': data_dict.get('weather_temp'),
+        'weather_humidity': data_dict.get('weather_humidity'),
+        'pressure': data_dict.get('pressure'),
+        'weather_precipitation': data_dict.get('precipitation'),
+        'cloud_cover': data_dict.get('cloud_cover'),
+        'visibility': data_dict.get('visibility'),
+        'wind_speed_avg': data_dict.get('wind_speed'),
+        'wind_speed_max': data_dict.get('wind_speed_max'),
+        'wind_dir': data_dict.get('wind_direction'),
+        'weather_code': data_dict.get('weather_code'),
         
-        # Логика варнингов и сохранения (остается прежней)
-        warnings = analyze_chemical_risks(input_data)
-        if input_data.co_level_ppm and input_data.co_level_ppm > 100:
-             result['predicted_ttf_days'] = min(result['predicted_ttf_days'], 3.0)
-             result['risk_level'] = "критический"
-             warnings.append("🔴 SAFETY: Критический уровень газа.")
+        'measurement_date': data_dict.get('measurement_date')
+    }
 
-        db_prediction = models.Prediction(
-            user_id=current_user.id,
-            storage_id=str(result['storage_id']),
-            stack_id=str(result['stack_id']),
-            input_data=data_dict,
-            predicted_days=int(result['predicted_ttf_days']),
-            confidence=int(result['confidence'] * 100),
-            risk_level=result['risk_level']
-        )
-        db.add(db_prediction)
-        db.commit()
-        db.refresh(db_prediction)
-        
-        return {
-            "id": db_prediction.id,
-            "storage_id": db_prediction.storage_id,
-            "stack_id": db_prediction.stack_id,
-            "predicted_ttf_days": result['predicted_ttf_days'],
-            "risk_level": result['risk_level'],
-            "confidence": result['confidence'],
-            "created_at": db_prediction.created_at,
-            "warnings": warnings
-        }
-        
-    except Exception as e:
-        print(f"❌ ML Runtime Error: {e}")
-        raise HTTPException(status_code=500, detail=f"ML Error: {str(e)}")
+def build_prediction(
+    input_data: schemas.PredictionInput,
+    data_dict: dict,
+    result: dict,
+    current_user: security.CurrentUser
+) -> Tuple[models.Prediction, List[str]]:
+    """Варнинги, Safety Layer по CO и строка для БД (commit делает вызывающий)."""
+    warnings = analyze_chemical_risks(input_data)
+    if input_data.co_level_ppm and input_data.co_level_ppm > 100:
+         result['predicted_ttf_days'] = min(result['predicted_ttf_days'], 3.0)
+         result['risk_level'] = "критический"
+         warnings.append("🔴 SAFETY: Критический уровень газа.")
+
+    db_prediction = models.Prediction(
+        user_id=current_user.id,
+        storage_id=str(result['storage_id']),
+        stack_id=str(result['stack_id']),
+        input_data=data_dict,
+        predicted_days=int(result['predicted_ttf_days']),
+        confidence=int(result['confidence'] * 100),
+        risk_level=result['risk_level']
+    )
+    return db_prediction, warnings
 
+def prediction_response(db_prediction: models.Prediction, result: dict, warnings: List[str]) -> dict:
+    return {
+        "id": db_prediction.id,
+        "storage_id": db_prediction.storage_id,
+        "stack_id": db_prediction.stack_id,
+        "predicted_ttf_days": result['predicted_ttf_days'],
+        "risk_level": result['risk_level'],
+        "confidence": result['confidence'],
+        "created_at": db_prediction.created_at,
+        "warnings": warnings
+    }
 
 @router.post("/", response_model=schemas.PredictionResponse)
 def predict_coal_fire(
     input_data: schemas.PredictionInput,
+    request: Request,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(security.get_current_active_user)
+    current_user: security.CurrentUser = Depends(security.get_current_active_user)
 ):
-    ml_model = get_predictor()
+    ml_model = get_predictor(request)
     
     try:
-        # 1. Подготовка данных для модели
-        # Модель v3.0 принимает DataFrame
-        data_dict = input_data.model_dump()
-        
-        # Маппинг полей Pydantic -> поля, которые ждет модель (если они отличаются)
-        # Но predictor.py сам делает rename, поэтому передаем как есть, главное имена ключей
-        input_df = pd.DataFrame([data_dict])
-        
-        # 2. Предсказание
-        # Возвращает список словарей, берем первый
-        results = ml_model.predict(input_df)
-        result = results[0]
-        
-        # 3. Анализ хим. рисков
-        warnings = analyze_chemical_risks(input_data)
+        # Один dump на запрос: он же идет в модель и в input_data (None-поля не храним)
+        data_dict = input_data.model_dump(exclude_none=True)
         
-        # Safety Layer: Если CO зашкаливает, ставим критический риск вручную
-        if input_data.co_level_ppm and input_data.co_level_ppm > 100:
-             result['predicted_ttf_days'] = min(result['predicted_ttf_days'], 3.0)
-             result['risk_level'] = "критический"
-             warnings.append("🔴 SAFETY: Критический уровень газа перекрывает ML-прогноз.")
-
-        # 4. Сохранение в БД
-        db_prediction = models.Prediction(
-            user_id=current_user.id,
-            storage_id=str(result['storage_id']),
-            stack_id=str(result['stack_id']),
-            input_data=data_dict,
-            predicted_days=int(result['predicted_ttf_days']),
-            confidence=int(result['confidence'] * 100),
-            risk_level=result['risk_level']
-        )
+        # Предикт одного замера без DataFrame
+        result = ml_model.predict_one(to_model_record(data_dict))
+        db_prediction, warnings = build_prediction(input_data, data_dict, result, current_user)
         db.add(db_prediction)
         db.commit()
-        db.refresh(db_prediction)
         
-        return {
-            "id": db_prediction.id,
-            "storage_id": db_prediction.storage_id,
-            "stack_id": db_prediction.stack_id,
-            "predicted_ttf_days": result['predicted_ttf_days'],
-            "risk_level": result['risk_level'],
-            "confidence": result['confidence'],
-            "created_at": db_prediction.created_at,
-            "warnings": warnings
-        }
+        # Готовый dict сразу в orjson, без повторной валидации по response_model
+        return ORJSONResponse(prediction_response(db_prediction, result, warnings))
         
     except Exception as e:
-        print(f"❌ ML Runtime Error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Ошибка ML модели: {str(e)}")
+        logger.exception("ML Runtime Error")
+        raise HTTPException(status_code=500, detail=f"ML Error: {str(e)}")
+
 
 @router.post("/forecast", response_model=schemas.ForecastResponse)
 def simulate_future_risk(
     input_data: schemas.PredictionInput,
-    current_user: models.User = Depends(security.get_current_active_user)
+    request: Request,
+    current_user: security.CurrentUser = Depends(security.get_current_active_user)
 ):
     """
     Симуляция будущего состояния.
     """
-    ml_model = get_predictor()
+    ml_model = get_predictor(request)
     
     forecast_points = []
     offsets = [0, 7, 14, 30]
@@ -218,21 +161,19 @@ def simulate_future_risk(
     # Простая модель нагрева для симуляции
     heating_rate = 0.1 if current_temp < 30 else (0.5 if current_temp < 50 else 2.0)
     
-    base_data = input_data.model_dump()
+    base_data = input_data.model_dump(exclude_none=True)
     
+    # Все сценарии одним вызовом модели
+    scenarios = []
     for days in offsets:
-        # Модифицируем данные для сценария
         scenario_data = base_data.copy()
         scenario_data['pile_age_days'] = (scenario_data.get('pile_age_days') or 0) + days
         scenario_data['max_temperature'] = current_temp + (heating_rate * days)
-        
-        # Создаем DF для предиктора
-        scenario_df = pd.DataFrame([scenario_data])
-        
-        # Предикт
-        res_list = ml_model.predict(scenario_df)
-        res = res_list[0]
-        
+        scenarios.append(scenario_data)
+    
+    results = ml_model.predict_records([to_model_record(d) for d in scenarios])
+    
+    for days, scenario_data, res in zip(offsets, scenarios, results):
         forecast_points.append({
             "days_offset": days,
             "predicted_days_left": res['predicted_ttf_days'],
@@ -250,46 +191,130 @@ def simulate_future_risk(
 @router.post("/batch", response_model=List[schemas.PredictionResponse])
 def predict_batch(
     inputs: List[schemas.PredictionInput],
+    request: Request,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(security.get_current_active_user)
+    current_user: security.CurrentUser = Depends(security.get_current_active_user)
 ):
-    """Массовая обработка (неоптимально, но работает)."""
-    results = []
-    for item in inputs:
-        res = predict_coal_fire(item, db, current_user)
-        results.append(res)
-    return results
+    """Массовая обработка: один вызов модели на весь пакет, замеры оцениваются независимо."""
+    ml_model = get_predictor(request)
+    
+    try:
+        data_dicts = [item.model_dump(exclude_none=True) for item in inputs]
+        results = ml_model.predict_records([to_model_record(d) for d in data_dicts])
+        built = [
+            build_prediction(item, data_dict, result, current_user)
+            for item, data_dict, result in zip(inputs, data_dicts, results)
+        ]
+        # Весь пакет - одна транзакция и один commit
+        db.add_all([db_prediction for db_prediction, _ in built])
+        db.commit()
+        
+        # Поля собраны нами же из модели и БД - отдаем как есть, без повторной
+        # pydantic-валидации каждого элемента (response_model остается для схемы)
+        return ORJSONResponse([
+            prediction_response(db_prediction, result, warnings)
+            for (db_prediction, warnings), result in zip(built, results)
+        ])
+        
+    except Exception as e:
+        logger.exception("ML Runtime Error")
+        raise HTTPException(status_code=500, detail=f"ML Error: {str(e)}")
+
+HISTORY_CHUNK_ROWS = 500
+
+def stream_history(user_id: int, limit: int):
+    """JSON-массив истории по частям: в памяти только текущая пачка строк."""
+    # Сессия своя: зависимость get_db закрывается до того, как ответ начнет отдаваться
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(
+            select(
+                models.Prediction.id,
+                models.Prediction.storage_id,
+                models.Prediction.stack_id,
+                models.Prediction.predicted_days,
+                models.Prediction.risk_level,
+                models.Prediction.confidence,
+                models.Prediction.created_at,
+            )
+            .where(models.Prediction.user_id == user_id)
+            .order_by(models.Prediction.created_at.desc())
+            .limit(limit)
+            .execution_options(yield_per=HISTORY_CHUNK_ROWS)
+        )
+        yield b"["
+        separator = b""
+        for partition in rows.partitions():
+            # В БД уверенность хранится в процентах, в ответе /predict - доля
+            chunk = orjson.dumps([
+                {
+                    "id": r.id,
+                    "storage_id": r.storage_id,
+                    "stack_id": r.stack_id,
+                    "predicted_ttf_days": r.predicted_days,
+                    "risk_level": r.risk_level,
+                    "confidence": r.confidence / 100,
+                    "created_at": r.created_at,
+                    "warnings": []
+                }
+                for r in partition
+            ])
+            yield separator + chunk[1:-1]
+            separator = b","
+        yield b"]"
+    finally:
+        db.close()
 
 @router.get("/history", response_model=list[schemas.PredictionResponse])
 def get_history(
     limit: int = 100,
-    db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(security.get_current_active_user)
+    current_user: security.CurrentUser = Depends(security.get_current_active_user)
 ):
-    return db.query(models.Prediction).filter(
-        models.Prediction.user_id == current_user.id
-    ).order_by(models.Prediction.created_at.desc()).limit(limit).all()
+    """Только нужные колонки, без ORM-объектов; ответ отдается потоком."""
+    return StreamingResponse(stream_history(current_user.id, limit), media_type="application/json")
 
 @router.get("/dashboard")
 def get_dashboard_data(
+    request: Request,
+    offset: int = 0,
+    limit: Optional[int] = None,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(security.get_current_active_user)
+    current_user: security.CurrentUser = Depends(security.get_current_active_user)
 ):
-    predictions = db.query(models.Prediction).filter(
-        models.Prediction.user_id == current_user.id
-    ).order_by(models.Prediction.created_at.desc()).all()
+    """Агрегаты считает БД; all_predictions можно листать через ?offset=&limit=."""
+    user_filter = models.Prediction.user_id == current_user.id
     
-    total = len(predictions)
-    risk_counts = {}
-    for p in predictions:
-        risk = p.risk_level
-        risk_counts[risk] = risk_counts.get(risk, 0) + 1
+    # Прогнозы только добавляются, поэтому пара (count, max(created_at)) меняется
+    # при любом изменении дашборда. Поллинг без новых данных получает пустой 304
+    total, last_created = db.query(
+        func.count(models.Prediction.id), func.max(models.Prediction.created_at)
+    ).filter(user_filter).one()
+    last_ts = int(last_created.timestamp() * 1_000_000) if last_created else 0
+    etag = f'W/"{current_user.id}-{total}-{last_ts}-{offset}-{limit}"'
+    # no-cache: браузер отвечает из кэша только после ревалидации, устаревших итогов не будет
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
     
-    critical_count = sum(1 for p in predictions if p.predicted_days < 7)
-    avg_confidence = sum(p.confidence for p in predictions) / total if total > 0 else 0
+    risk_counts = dict(
+        db.query(models.Prediction.risk_level, func.count(models.Prediction.id))
+        .filter(user_filter)
+        .group_by(models.Prediction.risk_level)
+        .all()
+    )
+    
+    critical_count = db.query(func.count(models.Prediction.id)).filter(
+        user_filter, models.Prediction.predicted_days < 7
+    ).scalar()
+    avg_confidence = db.query(func.avg(models.Prediction.confidence)).filter(user_filter).scalar() or 0
+    
+    # input_data (полный JSON входа) в дашборд не тянем - он отдается по /predict/{id}/input
+    newest_first = db.query(models.Prediction).filter(user_filter).order_by(models.Prediction.created_at.desc()).options(
+        defer(models.Prediction.input_data)
+    )
     
     recent_predictions = []
-    for p in predictions[:10]:
+    for p in newest_first.limit(10):
         recent_predictions.append({
             "id": p.id,
             "storage_id": p.storage_id,
@@ -297,10 +322,11 @@ def get_dashboard_data(
             "predicted_days": p.predicted_days,
             "risk_level": p.risk_level,
             "confidence": p.confidence,
-            "created_at": p.created_at.isoformat()
+            "created_at": p.created_at
         })
     
-    return {
+    # datetime orjson сериализует сам, jsonable_encoder по всему списку не нужен
+    return ORJSONResponse({
         "total_predictions": total,
         "critical_count": critical_count,
         "avg_confidence": int(avg_confidence),
@@ -314,9 +340,23 @@ def get_dashboard_data(
                 "predicted_days": p.predicted_days,
                 "risk_level": p.risk_level,
                 "confidence": p.confidence,
-                "created_at": p.created_at.isoformat(),
-                "input_data": p.input_data
+                "created_at": p.created_at
             }
-            for p in predictions
+            for p in newest_first.offset(offset).limit(limit)
         ]
-    }
\ No newline at end of file
+    }, headers=cache_headers)
+
+@router.get("/{prediction_id}/input")
+def get_prediction_input(
+    prediction_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: security.CurrentUser = Depends(security.get_current_active_user)
+):
+    """Входные данные одного прогноза (по запросу, а не в общем списке дашборда)."""
+    row = db.query(models.Prediction.input_data).filter(
+        models.Prediction.id == prediction_id,
+        models.Prediction.user_id == current_user.id
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return ORJSONResponse(row.input_data)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, field_validator
 from typing import Optional, List
 from datetime import datetime
 from .models import UserRole, UserStatus
@@ -26,6 +26,9 @@ class UserLogin(BaseModel):
 # --- PREDICTION ---
 
 class PredictionInput(BaseModel):
+    # Входные данные только читаются; лишние ключи от клиента просто отбрасываем
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True, extra='ignore')
+
     # Обязательные поля
     storage_id: str
     stack_id: str
@@ -60,6 +63,12 @@ class PredictionInput(BaseModel):
     ash_content: Optional[float] = 10.0
     moisture_content: Optional[float] = 12.0
 
+    @field_validator('storage_id', 'stack_id', mode='before')
+    @classmethod
+    def id_to_str(cls, v):
+        # Номера складов/штабелей часто приходят числом
+        return str(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+
 class PredictionResponse(BaseModel):
     id: int
     storage_id: str
@@ -1,26 +1,107 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from .database import get_db
 from .models import User
 import hashlib
+import heapq
+import time
 
 # В реальном проде это должно быть в .env
 SECRET_KEY = "super-secret-key-change-me-please"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Новые хэши - Argon2id (параметры по рекомендации OWASP), старые bcrypt-хэши продолжают проверяться
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """Снимок пользователя для обработчиков: не привязан к сессии БД, безопасно делить между запросами."""
+    id: int
+    email: str
+    role: str
+    status: str
+
+# Кэш пользователей по email для get_current_user: не ходим в БД на каждый запрос.
+# Кэш свой у каждого процесса: смена статуса/роли в админке сбрасывает запись через
+# invalidate_cached_user только в воркере, который обработал запрос, в остальных - по TTL
+USER_CACHE_TTL_SECONDS = 30
+USER_CACHE_MAX_SIZE = 10_000
+_user_cache: dict[str, tuple[float, CurrentUser]] = {}
+
+# Несуществующие email тоже помним недолго: повторный перебор не доходит до БД
+UNKNOWN_EMAIL_TTL_SECONDS = 5
+_unknown_emails: dict[str, float] = {}
+
+# Ограничение неудачных попыток аутентификации. Ключ - IP для токенов, для логина
+# два счетчика: IP+email (перебор пароля) и IP (один пароль по многим аккаунтам).
+# Лимит срабатывает только на неудачных попытках, валидный токен им никогда не отсекается
+AUTH_FAIL_LIMIT = 20
+AUTH_IP_FAIL_LIMIT = 100
+AUTH_FAIL_WINDOW_SECONDS = 60
+_auth_failures: dict[str, tuple[float, int]] = {}
+
+def invalidate_cached_user(email: str) -> None:
+    _user_cache.pop(email, None)
+    _unknown_emails.pop(email, None)
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def check_auth_rate(key: str, limit: int = AUTH_FAIL_LIMIT) -> None:
+    """429, если по этому ключу за окно уже было limit неудачных попыток."""
+    window = _auth_failures.get(key)
+    if window is not None and window[0] > time.monotonic() and window[1] >= limit:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много неудачных попыток входа. Попробуйте позже."
+        )
+
+def record_auth_failure(key: str) -> None:
+    now = time.monotonic()
+    expires, count = _auth_failures.get(key, (0.0, 0))
+    if expires <= now:
+        expires, count = now + AUTH_FAIL_WINDOW_SECONDS, 0
+    if key not in _auth_failures and len(_auth_failures) >= USER_CACHE_MAX_SIZE:
+        _evict_auth_failures(now)
+    _auth_failures[key] = (expires, count + 1)
+
+def _evict_auth_failures(now: float) -> None:
+    # Таблицу целиком не чистим, иначе мусорными ключами можно сбросить счетчик жертвы.
+    # Сначала истекшие окна, если их мало - десятая часть записей с наименьшим числом неудач
+    for key in [key for key, (expires, _) in _auth_failures.items() if expires <= now]:
+        del _auth_failures[key]
+    if len(_auth_failures) >= USER_CACHE_MAX_SIZE:
+        weakest = heapq.nsmallest(
+            USER_CACHE_MAX_SIZE // 10, _auth_failures.items(), key=lambda item: (item[1][1], item[1][0])
+        )
+        for key, _ in weakest:
+            del _auth_failures[key]
+
+def reject_auth(key: str, exc: HTTPException) -> None:
+    """Неудачная попытка: 429, если лимит по ключу уже исчерпан, иначе exc."""
+    check_auth_rate(key)
+    record_auth_failure(key)
+    raise exc
+
 def _pre_hash_password(password: str) -> str:
     """
     Pre-hash password using SHA-256 to ensure it's within bcrypt's 72 byte limit.
-    This is a security best practice when dealing with potentially long passwords.
+    Kept for argon2 too, so existing bcrypt hashes verify the same way.
     """
     return hashlib.sha256(password.encode('utf-8')).hexdigest()
 
@@ -40,26 +121,42 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    ip = client_ip(request)
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        email = None
+    if email is None:
+        reject_auth(ip, credentials_exception)
+        
+    now = time.monotonic()
+    cached = _user_cache.get(email)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    if _unknown_emails.get(email, 0.0) > now:
+        reject_auth(ip, credentials_exception)
         
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
+    row = db.query(User.id, User.email, User.role, User.status).filter(User.email == email).first()
+    if row is None:
+        if len(_unknown_emails) >= USER_CACHE_MAX_SIZE:
+            _unknown_emails.clear()
+        _unknown_emails[email] = now + UNKNOWN_EMAIL_TTL_SECONDS
+        reject_auth(ip, credentials_exception)
+    if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+        _user_cache.clear()
+    user = CurrentUser(*row)
+    _user_cache[email] = (now + USER_CACHE_TTL_SECONDS, user)
     return user
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: CurrentUser = Depends(get_current_user)):
     if current_user.status != "approved":
         raise HTTPException(
             status_code=403, 
@@ -67,7 +164,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         )
     return current_user
 
-async def get_current_admin(current_user: User = Depends(get_current_user)):
+async def get_current_admin(current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Требуются права администратора")
     return current_user
\ No newline at end of file
@@ -1,30 +1,63 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from app.logging_setup import logger, start_log_listener
+from app.config import get_config
 from app.database import engine, Base
-from app.routers import auth, admin, prediction
+from app.routers import api_router, prediction
 
-# Создаем таблицы при старте
-Base.metadata.create_all(bind=engine)
+def create_schema():
+    Base.metadata.create_all(bind=engine)
+    
+    # create_all не трогает уже существующие таблицы - новые индексы добавляем отдельно
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener = start_log_listener()
+    
+    # Таблицы создаем при старте приложения, а не при импорте модуля
+    if get_config().run_create_all:
+        create_schema()
+    
+    # Грузим и прогреваем модель при старте, чтобы первый /predict не ждал joblib.load
+    app.state.predictor = prediction.create_predictor()
+    if app.state.predictor is None:
+        logger.warning("ML модуль не загружен, /predict будет недоступен")
+    else:
+        # Ошибка прогрева не должна ронять старт API: /predict вернет ее сам
+        try:
+            app.state.predictor.warm_up()
+        except Exception:
+            logger.exception("Не удалось прогреть модель")
+    yield
+    
+    log_listener.stop()
 
 app = FastAPI(
     title="Coal Fire Prediction System",
     description="Backend API for Vibeton Hackathon 2025",
-    version="1.0.0"
+    version="1.0.0",
+    # Ответы сериализуем через orjson вместо stdlib json
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# CORS (чтобы фронтенд мог стучаться)
+# CORS (чтобы фронтенд мог стучаться): явный список origin, методов и заголовков
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"], # В проде указать конкретный домен
+    allow_origins=list(get_config().cors_origins),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PATCH"],
+    allow_headers=["Authorization", "Content-Type"],
 )
 
 # Подключаем роуты
-app.include_router(auth.router)
-app.include_router(admin.router)
-app.include_router(prediction.router)
+app.include_router(api_router)
 
 @app.get("/")
 def root():
@@ -38,4 +71,23 @@ def root():
             "dashboard": "/predict/dashboard",
             "history": "/predict/history"
         }
-    }
\ No newline at end of file
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Запуск из папки backend: python main.py. С uvicorn[standard] loop/http="auto"
+    # выбирают uvloop и httptools (на Windows - стандартный asyncio).
+    # По умолчанию один воркер: кэш пользователей, счетчики неудачных входов,
+    # флаг users_exist и кэш скоров живут в памяти процесса, и сброс в одном воркере
+    # не виден другим. WORKERS > 1 - только вместе с серверной БД (не sqlite) и с учетом того,
+    # что отклоненный админом пользователь может до 30 с работать через другие воркеры
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WORKERS", "1")),
+        loop="auto",
+        http="auto",
+        log_level="warning",
+    )
@@ -5,7 +5,9 @@ import react from '@vitejs/plugin-react'
 export default defineConfig({
   plugins: [react()],
   server: {
-    host: true, // Позволяет доступ по IP (важно для докера и иногда для локалки)
+    // Позволяет доступ по IP (важно для докера и иногда для локалки).
+    // Такой origin (например http://192.168.1.20:5173) нужно добавить в CORS_ORIGINS бэкенда
+    host: true,
     port: 5173,
   }
 })
\ No newline at end of file
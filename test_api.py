@@ -1,18 +1,30 @@
 #!/usr/bin/env python3
 """Quick API test script."""
 
-import requests
-import json
+from importlib.util import find_spec
+
+import httpx
+import orjson
 from datetime import datetime
 
 API_URL = "http://localhost:8000"
 
+# Один клиент на весь прогон: соединения переиспользуются, с удаленным HTTPS-хостом
+# запросы идут по HTTP/2, если установлен h2 (httpx[http2] из requirements.txt).
+# Редиректы (например 307 на путь со слешем) httpx сам не проходит - включаем, как было в requests
+CLIENT = httpx.Client(
+    http2=find_spec("h2") is not None,
+    base_url=API_URL,
+    limits=httpx.Limits(max_connections=16),
+    follow_redirects=True,
+)
+
 def test_health():
     """Test health endpoint."""
     print("Testing /health...")
-    response = requests.get(f"{API_URL}/health")
+    response = CLIENT.get("/health")
     print(f"Status: {response.status_code}")
-    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    print(f"Response: {orjson.dumps(orjson.loads(response.content), option=orjson.OPT_INDENT_2).decode()}")
     return response.status_code == 200
 
 def test_prediction():
@@ -34,11 +46,11 @@ def test_prediction():
         ]
     }
     
-    response = requests.post(f"{API_URL}/predict", json=data)
+    response = CLIENT.post("/predict/", json=data)
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200:
-        result = response.json()[0]
+        result = orjson.loads(response.content)[0]
         print(f"✅ Prediction successful!")
         print(f"  Storage/Stack: {result['storage_id']}/{result['stack_id']}")
         print(f"  Predicted days until fire: {result['predicted_ttf_days']:.1f}")
@@ -53,11 +65,11 @@ def test_prediction():
 def test_metrics():
     """Test metrics endpoint."""
     print("\nTesting /api/metrics...")
-    response = requests.get(f"{API_URL}/api/metrics")
+    response = CLIENT.get("/api/metrics")
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200:
-        metrics = response.json()
+        metrics = orjson.loads(response.content)
         print(f"  Accuracy (±2 days): {metrics['accuracy_2days']:.2%}")
         print(f"  MAE: {metrics['mae']:.2f} days")
         print(f"  KPI Achieved: {'✅' if metrics['kpi_achieved'] else '❌'}")
@@ -72,6 +84,7 @@ if __name__ == "__main__":
     success = test_health() and success
     success = test_prediction() and success
     success = test_metrics() and success
+    CLIENT.close()
     
     print("\n" + "="*50)
     if success:
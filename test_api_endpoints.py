@@ -3,12 +3,24 @@
 Тест всех эндпоинтов API с полными данными
 """
 
-import requests
-import json
-from datetime import datetime
+from importlib.util import find_spec
+
+import httpx
+import orjson
+import time
 
 BASE_URL = "http://localhost:8000"
 
+# Один клиент на весь прогон: соединения переиспользуются, с удаленным HTTPS-хостом
+# запросы идут по HTTP/2, если установлен h2 (httpx[http2] из requirements.txt).
+# Редиректы (например 307 на путь со слешем) httpx сам не проходит - включаем, как было в requests
+CLIENT = httpx.Client(
+    http2=find_spec("h2") is not None,
+    base_url=BASE_URL,
+    limits=httpx.Limits(max_connections=16),
+    follow_redirects=True,
+)
+
 def print_header(text):
     print("\n" + "="*60)
     print(f"  {text}")
@@ -18,17 +30,18 @@ def test_register():
     print_header("1️⃣  ТЕСТ: Регистрация пользователя")
     
     data = {
-        "email": f"test_{datetime.now().timestamp()}@example.com",
+        "email": f"test_{time.time_ns()}@example.com",
         "full_name": "Test User",
         "password": "test123"
     }
     
-    response = requests.post(f"{BASE_URL}/auth/register", json=data)
+    response = CLIENT.post("/auth/register", json=data)
     print(f"Статус: {response.status_code}")
     
     if response.status_code == 200:
-        print(f"✅ Пользователь зарегистрирован: {response.json()['email']}")
-        return response.json()['email'], data['password']
+        email = orjson.loads(response.content)['email']
+        print(f"✅ Пользователь зарегистрирован: {email}")
+        return email, data['password']
     else:
         print(f"❌ Ошибка: {response.text}")
         return None, None
@@ -41,8 +54,8 @@ def test_login(email, password):
         "password": password
     }
     
-    response = requests.post(
-        f"{BASE_URL}/token",
+    response = CLIENT.post(
+        "/token",
         data=data,
         headers={"Content-Type": "application/x-www-form-urlencoded"}
     )
@@ -50,28 +63,27 @@ def test_login(email, password):
     print(f"Статус: {response.status_code}")
     
     if response.status_code == 200:
-        token = response.json()['access_token']
+        token = orjson.loads(response.content)['access_token']
         print(f"✅ Получен токен: {token[:20]}...")
         return token
     else:
         print(f"❌ Ошибка: {response.text}")
         return None
 
-def test_predict_basic(token):
+def test_predict_basic():
     print_header("3️⃣  ТЕСТ: Базовый прогноз (минимум полей)")
     
-    headers = {"Authorization": f"Bearer {token}"}
     data = {
         "storage_id": "11",
         "stack_id": "11",
         "max_temperature": 45.5
     }
     
-    response = requests.post(f"{BASE_URL}/predict/", json=data, headers=headers)
+    response = CLIENT.post("/predict/", json=data)
     print(f"Статус: {response.status_code}")
     
     if response.status_code == 200:
-        result = response.json()
+        result = orjson.loads(response.content)
         print(f"✅ Прогноз получен:")
         print(f"   • Дней до пожара: {result['predicted_ttf_days']:.1f}")
         print(f"   • Риск: {result['risk_level']}")
@@ -82,10 +94,9 @@ def test_predict_basic(token):
         print(f"❌ Ошибка: {response.text}")
         return None
 
-def test_predict_full(token):
+def test_predict_full():
     print_header("4️⃣  ТЕСТ: Полный прогноз (все поля)")
     
-    headers = {"Authorization": f"Bearer {token}"}
     data = {
         # Обязательные
         "storage_id": "11",
@@ -119,13 +130,13 @@ def test_predict_full(token):
     }
     
     print("📤 Отправка данных:")
-    print(json.dumps(data, indent=2, ensure_ascii=False))
+    print(orjson.dumps(data, option=orjson.OPT_INDENT_2).decode())
     
-    response = requests.post(f"{BASE_URL}/predict/", json=data, headers=headers)
+    response = CLIENT.post("/predict/", json=data)
     print(f"\nСтатус: {response.status_code}")
     
     if response.status_code == 200:
-        result = response.json()
+        result = orjson.loads(response.content)
         print(f"✅ Прогноз получен:")
         print(f"   • Дней до пожара: {result['predicted_ttf_days']:.1f}")
         print(f"   • Риск: {result['risk_level']}")
@@ -140,10 +151,9 @@ def test_predict_full(token):
         print(f"❌ Ошибка: {response.text}")
         return None
 
-def test_predict_critical(token):
+def test_predict_critical():
     print_header("5️⃣  ТЕСТ: Критический случай (высокая температура)")
     
-    headers = {"Authorization": f"Bearer {token}"}
     data = {
         "storage_id": "11",
         "stack_id": "13",
@@ -153,11 +163,11 @@ def test_predict_critical(token):
         "moisture_content": 3.0  # Очень сухой!
     }
     
-    response = requests.post(f"{BASE_URL}/predict/", json=data, headers=headers)
+    response = CLIENT.post("/predict/", json=data)
     print(f"Статус: {response.status_code}")
     
     if response.status_code == 200:
-        result = response.json()
+        result = orjson.loads(response.content)
         print(f"✅ Прогноз получен:")
         print(f"   • Дней до пожара: {result['predicted_ttf_days']:.1f}")
         print(f"   • Риск: {result['risk_level']}")
@@ -171,16 +181,15 @@ def test_predict_critical(token):
         print(f"❌ Ошибка: {response.text}")
         return None
 
-def test_dashboard(token):
+def test_dashboard():
     print_header("6️⃣  ТЕСТ: Дашборд")
     
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{BASE_URL}/predict/dashboard", headers=headers)
+    response = CLIENT.get("/predict/dashboard")
     
     print(f"Статус: {response.status_code}")
     
     if response.status_code == 200:
-        data = response.json()
+        data = orjson.loads(response.content)
         print(f"✅ Данные дашборда получены:")
         print(f"   • Всего предсказаний: {data['total_predictions']}")
         print(f"   • Критических: {data['critical_count']}")
@@ -191,16 +200,15 @@ def test_dashboard(token):
         print(f"❌ Ошибка: {response.text}")
         return None
 
-def test_history(token):
+def test_history():
     print_header("7️⃣  ТЕСТ: История предсказаний")
     
-    headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(f"{BASE_URL}/predict/history?limit=5", headers=headers)
+    response = CLIENT.get("/predict/history?limit=5")
     
     print(f"Статус: {response.status_code}")
     
     if response.status_code == 200:
-        data = response.json()
+        data = orjson.loads(response.content)
         print(f"✅ История получена: {len(data)} записей")
         for i, pred in enumerate(data[:3], 1):
             print(f"   {i}. #{pred['id']} - {pred['predicted_ttf_days']:.1f} дней ({pred['risk_level']})")
@@ -232,15 +240,17 @@ def main():
     if not token:
         print("\n❌ Не удалось авторизоваться")
         return
+    # Токен ставим на сессию один раз - дальше он уходит с каждым запросом
+    CLIENT.headers.update({"Authorization": f"Bearer {token}"})
     
     # Тесты предсказаний
-    test_predict_basic(token)
-    test_predict_full(token)
-    test_predict_critical(token)
+    test_predict_basic()
+    test_predict_full()
+    test_predict_critical()
     
     # Тесты дашборда
-    test_dashboard(token)
-    test_history(token)
+    test_dashboard()
+    test_history()
     
     print_header("✅ ВСЕ ТЕСТЫ ЗАВЕРШЕНЫ!")
     print("\n📊 ИТОГ:")
@@ -261,4 +271,5 @@ if __name__ == "__main__":
         print(f"\n\n❌ КРИТИЧЕСКАЯ ОШИБКА: {e}")
         import traceback
         traceback.print_exc()
-
+    finally:
+        CLIENT.close()
@@ -4,25 +4,30 @@
 Проверяем, что модель ведет себя логично.
 """
 
+import random
 import sys
+from functools import lru_cache
 from pathlib import Path
+
 import pandas as pd
 
 sys.path.insert(0, str(Path(__file__).parent))
 
 from ML.predictor import CoalCombustionPredictor
 
+# Модель грузится один раз на весь прогон (и под pytest, и из __main__)
+@lru_cache(maxsize=1)
+def make_predictor():
+    project_root = Path(__file__).parent
+    return CoalCombustionPredictor(
+        data_dir=project_root / "data",
+        artifacts_dir=project_root / "ML" / "artifacts"
+    )
+
 def test_temperature_predictions():
     """Тестируем предсказания для разных температур."""
     
-    project_root = Path(__file__).parent
-    data_dir = project_root / "data"
-    artifacts_dir = project_root / "ML" / "artifacts"
-    
-    predictor = CoalCombustionPredictor(
-        data_dir=data_dir,
-        artifacts_dir=artifacts_dir
-    )
+    predictor = make_predictor()
     
     print("\n" + "="*70)
     print("🧪 ТЕСТ ПРЕДСКАЗАНИЙ ДЛЯ РАЗНЫХ ТЕМПЕРАТУР")
@@ -35,9 +40,9 @@ def test_temperature_predictions():
     print(f"{'Температура':<15} {'Прогноз (дней)':<20} {'Уверенность':<15} {'Уровень риска'}")
     print("-" * 70)
     
-    for temp in test_temps:
-        # Создаем тестовый датафрейм
-        test_df = pd.DataFrame([{
+    # Все температуры одним вызовом модели: каждая строка - независимый замер
+    records = [
+        {
             'storage_id': '11',
             'stack_id': '11',
             'measurement_date': '2026-07-18',
@@ -46,28 +51,27 @@ def test_temperature_predictions():
             'stack_mass_tons': 5000,
             'weather_humidity': 22,
             'weather_temp': 13
-        }])
+        }
+        for temp in test_temps
+    ]
+    results = predictor.predict_records(records)
+    
+    for temp, result in zip(test_temps, results):
+        days = result['predicted_ttf_days']
+        confidence = result['confidence']
+        risk = result['risk_level']
         
-        # Делаем предсказание
-        results = predictor.predict(test_df)
+        # Цветовое форматирование
+        if days < 7:
+            color = "🔴"
+        elif days < 14:
+            color = "🟠"
+        elif days < 30:
+            color = "🟡"
+        else:
+            color = "🟢"
         
-        if results:
-            result = results[0]
-            days = result['predicted_ttf_days']
-            confidence = result['confidence']
-            risk = result['risk_level']
-            
-            # Цветовое форматирование
-            if days < 7:
-                color = "🔴"
-            elif days < 14:
-                color = "🟠"
-            elif days < 30:
-                color = "🟡"
-            else:
-                color = "🟢"
-            
-            print(f"{temp}°C{' '*11} {color} {days:>6.1f} дней{' '*9} {confidence*100:>5.1f}%{' '*9} {risk}")
+        print(f"{f'{temp}°C':<15} {f'{color} {days:>6.1f} дней':<20} {f'{confidence*100:>5.1f}%':<15} {risk}")
     
     print("\n" + "="*70)
     print("✅ ПРОВЕРКА ЗАВЕРШЕНА")
@@ -79,6 +83,40 @@ def test_temperature_predictions():
     print("   • При temp < 10°C → предупреждение + замена на 30°C")
     print("   • Больше НЕТ принудительных override для 45-60°C\n")
 
+def test_row_path_parity(n=200):
+    """predict_records (путь /predict, /batch, /forecast) должен совпадать с predict() на одной строке."""
+    predictor = make_predictor()
+    rng = random.Random(0)
+    # Как в to_model_record: пропущенная категория приходит ключом со значением None
+    categorical = {
+        'coal_grade': lambda: rng.choice(['A', 'B', 'unknown']),
+        'picket': lambda: str(rng.randint(1, 20)),
+        'shift': lambda: rng.choice(['1', '2']),
+        'weather_code': lambda: rng.randint(0, 3),
+    }
+    numeric = {
+        'wind_dir': lambda: rng.uniform(0, 360),
+        'weather_humidity': lambda: rng.uniform(10, 100),
+    }
+    mismatches = 0
+    for i in range(n):
+        record = {
+            'storage_id': '1', 'stack_id': str(i), 'measurement_date': '2026-07-18',
+            'max_temperature': rng.uniform(0, 80)
+        }
+        for col, make in categorical.items():
+            record[col] = make() if rng.random() < 0.5 else None
+        for col, make in numeric.items():
+            if rng.random() < 0.5:
+                record[col] = make()
+        expected = predictor.predict(pd.DataFrame([record]))[0]
+        actual = predictor.predict_records([record])[0]
+        if abs(expected['predicted_ttf_days'] - actual['predicted_ttf_days']) > 1e-4:
+            mismatches += 1
+    print(f"\n🔁 Совпадение predict() и predict_records: {n - mismatches}/{n} (pandas {pd.__version__})")
+    assert mismatches == 0
+
 if __name__ == "__main__":
     test_temperature_predictions()
+    test_row_path_parity()
 
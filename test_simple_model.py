@@ -75,7 +75,7 @@ def main():
         else:
             emoji = "⚪"
         
-        print(f"{temp}°C{' '*11} {age} дней{' '*5} {emoji} {days:>5.1f} дней{' '*8} {conf*100:>5.1f}%{' '*9} {risk:<15} {desc}")
+        print(f"{f'{temp}°C':<15} {f'{age} дней':<12} {f'{emoji} {days:>5.1f} дней':<18} {f'{conf*100:>5.1f}%':<15} {risk:<15} {desc}")
     
     print("\n" + "="*80)
     print("✅ ТЕСТ ЗАВЕРШЕН")